@@ -0,0 +1,411 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from update_kobun_json import SHARD_DIR, load_shards, normalize_word
+
+# Anki collection schema (version 11), as read by Anki desktop 2.1.x.
+SCHEMA_VERSION = 11
+ANKI_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null,
+    scm integer not null, ver integer not null, dty integer not null,
+    usn integer not null, ls integer not null, conf text not null,
+    models text not null, decks text not null, dconf text not null,
+    tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null,
+    mod integer not null, usn integer not null, tags text not null,
+    flds text not null, sfld integer not null, csum integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null,
+    ord integer not null, mod integer not null, usn integer not null,
+    type integer not null, queue integer not null, due integer not null,
+    ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null,
+    odid integer not null, flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null,
+    ease integer not null, ivl integer not null, lastIvl integer not null,
+    factor integer not null, time integer not null, type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+FIELD_SEPARATOR = "\x1f"
+GUID_ALPHABET = (
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    "!#$%&()*+,-./:;<=>?@[]^_`{|}~"
+)
+MODEL_FIELDS = ["Front", "Back"]
+MODEL_CSS = ".card { font-family: sans-serif; font-size: 22px; text-align: center; }"
+
+
+@dataclass(frozen=True)
+class Note:
+    key: str
+    fields: Tuple[str, str]
+    tags: str
+
+
+@dataclass(frozen=True)
+class DeckSpec:
+    name: str
+    title: str
+    source: str
+    loader: Callable[[str], List[Note]]
+
+
+@dataclass(frozen=True)
+class ExportReport:
+    path: str
+    total: int
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
+def stable_int(text: str, bits: int = 52) -> int:
+    # Keep ids below 2**53 so they survive JSON round-trips in Anki.
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & ((1 << bits) - 1) or 1
+
+
+def note_guid(deck: str, key: str) -> str:
+    value = stable_int(f"{deck}:{key}", bits=64)
+    chars = []
+    while value:
+        value, rem = divmod(value, len(GUID_ALPHABET))
+        chars.append(GUID_ALPHABET[rem])
+    return "".join(reversed(chars)) or GUID_ALPHABET[0]
+
+
+def strip_html(text: str) -> str:
+    # Same order as Anki: drop tags, then unescape entities written by html_escape.
+    return html.unescape(re.sub(r"<[^>]+>", "", text))
+
+
+def field_checksum(text: str) -> int:
+    return int(hashlib.sha1(strip_html(text).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def html_escape(text: Any) -> str:
+    s = "" if text is None else str(text)
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\n", "<br>")
+
+
+def load_json(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"Expected list json: {path}")
+    return [x for x in data if isinstance(x, dict)]
+
+
+def load_kobun(path: str) -> List[Note]:
+    return kobun_notes(load_json(path))
+
+
+def kobun_notes(items: List[Dict[str, Any]]) -> List[Note]:
+    notes = []
+    for it in items:
+        key = normalize_word(it.get("word"))
+        if not key:
+            continue
+        back = html_escape(it.get("meaning"))
+        if it.get("hint"):
+            back += f"<br><small>{html_escape(it.get('hint'))}</small>"
+        if it.get("example"):
+            back += f"<hr>{html_escape(it.get('example'))}"
+        notes.append(Note(key=key, fields=(html_escape(it.get("word")), back), tags="kobun"))
+    return notes
+
+
+def load_kanbun(path: str) -> List[Note]:
+    notes = []
+    for it in load_json(path):
+        word = normalize_word(it.get("word"))
+        if not word:
+            continue
+        # Several kanbun words share a spelling but differ in reading (e.g. 見ル / 見ユ).
+        reading = normalize_word(it.get("reading"))
+        key = f"{word}|{reading}" if reading else word
+        front = html_escape(it.get("word"))
+        if reading:
+            front += f"<br><small>{html_escape(it.get('reading'))}</small>"
+        back = html_escape(it.get("meaning"))
+        if it.get("explanation"):
+            back += f"<hr>{html_escape(it.get('explanation'))}"
+        notes.append(Note(key=key, fields=(front, back), tags="kanbun"))
+    return notes
+
+
+def load_vocab1900(path: str) -> List[Note]:
+    notes = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 3:
+                continue
+            key = normalize_word(cols[1]).lower()
+            if not cols[0].strip() or not key:
+                continue
+            back = html_escape(cols[2].strip())
+            if len(cols) > 3 and cols[3].strip():
+                back += f"<hr>{html_escape(cols[3].strip())}"
+            notes.append(Note(key=key, fields=(html_escape(cols[1].strip()), back), tags="vocab1900"))
+    return notes
+
+
+def load_constitution(path: str) -> List[Note]:
+    notes = []
+    for it in load_json(path):
+        # Articles have no headword; the article id is the stable key.
+        key = normalize_word(it.get("id"))
+        text = str(it.get("text") or "")
+        if not key or not text:
+            continue
+        title = f"{it.get('source', '')} {it.get('number', '')}".strip()
+        front = f"<small>{html_escape(title)}</small><br>" + html_escape(re.sub(r"【.*?】", "【　　】", text))
+        back = re.sub(r"【(.*?)】", r"<b>【\1】</b>", html_escape(text))
+        notes.append(Note(key=key, fields=(front, back), tags="constitution"))
+    return notes
+
+
+def resources_dir() -> pathlib.Path:
+    repo_root = pathlib.Path(__file__).resolve().parent.parent
+    return repo_root / "Sources" / "ANKI-HUB-iOS" / "Resources"
+
+
+DECKS: Dict[str, DeckSpec] = {
+    "kobun": DeckSpec("kobun", "ANKI-HUB::古文単語", "kobun.json", load_kobun),
+    "kanbun": DeckSpec("kanbun", "ANKI-HUB::漢文", "kanbun.json", load_kanbun),
+    "vocab1900": DeckSpec("vocab1900", "ANKI-HUB::英単語1900", "vocab1900.tsv", load_vocab1900),
+    "constitution": DeckSpec("constitution", "ANKI-HUB::日本国憲法", "constitution.json", load_constitution),
+}
+
+
+def dedupe(notes: List[Note]) -> List[Note]:
+    # One note per GUID: the first occurrence keeps its position and
+    # distinct answers from later duplicates are appended to its back.
+    first: Dict[str, Note] = {}
+    backs: Dict[str, List[str]] = {}
+    for n in notes:
+        if n.key not in first:
+            first[n.key] = n
+            backs[n.key] = [n.fields[1]]
+        elif n.fields[1] not in backs[n.key]:
+            backs[n.key].append(n.fields[1])
+    return [Note(n.key, (n.fields[0], "<br>".join(backs[k])), n.tags) for k, n in first.items()]
+
+
+def collection_json(spec: DeckSpec, deck_id: int, model_id: int, now: int) -> Dict[str, str]:
+    conf = {
+        "activeDecks": [1], "curDeck": 1, "newSpread": 0, "collapseTime": 1200,
+        "timeLim": 0, "estTimes": True, "dueCounts": True, "curModel": None,
+        "nextPos": 1, "sortType": "noteFld", "sortBackwards": False, "addToCur": True,
+    }
+    model = {
+        "id": model_id, "name": f"{spec.title} (Basic)", "type": 0, "mod": now, "usn": -1,
+        "sortf": 0, "did": deck_id, "tags": [], "vers": [], "css": MODEL_CSS,
+        "latexPre": "\\documentclass[12pt]{article}\n\\begin{document}\n",
+        "latexPost": "\\end{document}", "req": [[0, "any", [0]]],
+        "flds": [
+            {"name": name, "ord": i, "sticky": False, "rtl": False, "font": "Arial", "size": 20, "media": []}
+            for i, name in enumerate(MODEL_FIELDS)
+        ],
+        "tmpls": [{
+            "name": "Card 1", "ord": 0, "did": None, "bqfmt": "", "bafmt": "",
+            "qfmt": "{{Front}}", "afmt": "{{FrontSide}}<hr id=answer>{{Back}}",
+        }],
+    }
+
+    def deck(did: int, name: str) -> Dict[str, Any]:
+        return {
+            "id": did, "name": name, "desc": "", "mod": now, "usn": -1, "collapsed": False,
+            "browserCollapsed": False, "dyn": 0, "conf": 1, "extendNew": 10, "extendRev": 50,
+            "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+        }
+
+    dconf = {
+        "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True,
+        "timer": 0, "replayq": True, "dyn": False,
+        "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1,
+                "perDay": 20, "bury": True, "separate": True},
+        "rev": {"perDay": 200, "ease4": 1.3, "fuzz": 0.05, "ivlFct": 1, "maxIvl": 36500,
+                "minSpace": 1, "bury": True},
+        "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 0},
+    }
+    return {
+        "conf": json.dumps(conf),
+        "models": json.dumps({str(model_id): model}, ensure_ascii=False),
+        "decks": json.dumps({"1": deck(1, "Default"), str(deck_id): deck(deck_id, spec.title)}, ensure_ascii=False),
+        "dconf": json.dumps({"1": dconf}),
+    }
+
+
+def create_collection(conn: sqlite3.Connection, spec: DeckSpec, deck_id: int, model_id: int, now: int) -> None:
+    conn.executescript(ANKI_SCHEMA)
+    meta = collection_json(spec, deck_id, model_id, now)
+    conn.execute(
+        "INSERT INTO col VALUES (1, ?, ?, ?, ?, 0, 0, 0, ?, ?, ?, ?, '{}')",
+        (now, now * 1000, now * 1000, SCHEMA_VERSION, meta["conf"], meta["models"], meta["decks"], meta["dconf"]),
+    )
+
+
+def write_notes(
+    conn: sqlite3.Connection, spec: DeckSpec, notes: List[Note], deck_id: int, model_id: int, now: int
+) -> Tuple[int, int, int, int]:
+    existing: Dict[str, Tuple[int, str, str]] = {
+        guid: (nid, flds, tags) for nid, guid, flds, tags in conn.execute("SELECT id, guid, flds, tags FROM notes")
+    }
+
+    note_rows = []
+    card_rows = []
+    inserted = updated = unchanged = 0
+    wanted = set()
+    # New cards are queued after any already in the collection (incremental mode).
+    next_due = (conn.execute("SELECT max(due) FROM cards").fetchone()[0] or 0) + 1
+    for n in notes:
+        guid = note_guid(spec.name, n.key)
+        wanted.add(guid)
+        flds = FIELD_SEPARATOR.join(n.fields)
+        tags = f" {n.tags} "
+        prev = existing.get(guid)
+        if prev and prev[1] == flds and prev[2] == tags:
+            unchanged += 1
+            continue
+        nid = prev[0] if prev else stable_int(f"note:{guid}")
+        note_rows.append((nid, guid, model_id, now, -1, tags, flds, strip_html(n.fields[0]), field_checksum(n.fields[0]), 0, ""))
+        if prev:
+            updated += 1
+        else:
+            inserted += 1
+            card_rows.append((stable_int(f"card:{guid}"), nid, deck_id, 0, now, -1, 0, 0, next_due, 0, 0, 0, 0, 0, 0, 0, 0, ""))
+            next_due += 1
+
+    stale = [(existing[g][0],) for g in existing.keys() - wanted]
+
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", note_rows)
+        conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", card_rows)
+        conn.executemany("DELETE FROM cards WHERE nid = ?", stale)
+        conn.executemany("DELETE FROM notes WHERE id = ?", stale)
+        if note_rows or card_rows or stale:
+            conn.execute("UPDATE col SET mod = ?", (now * 1000,))
+    return inserted, updated, len(stale), unchanged
+
+
+def kobun_shard_spec(shard_dir: str, rows: Optional[List[str]]) -> DeckSpec:
+    """kobun deck read through the shard manifest, loading only the requested rows."""
+    def loader(path: str) -> List[Note]:
+        return kobun_notes(load_shards(path, rows))
+
+    return replace(DECKS["kobun"], source=shard_dir, loader=loader)
+
+
+def export_deck(spec: DeckSpec, out_dir: str, incremental: bool, out_name: Optional[str] = None) -> ExportReport:
+    source = resources_dir() / spec.source
+    if not source.exists():
+        raise SystemExit(f"Not found: {source}")
+    notes = dedupe(spec.loader(str(source)))
+
+    out_path = os.path.join(out_dir, f"{out_name or spec.name}.apkg")
+    deck_id = stable_int(f"deck:{spec.name}")
+    model_id = stable_int(f"model:{spec.name}")
+    now = int(time.time())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "collection.anki2")
+        reuse = False
+        if incremental and os.path.exists(out_path):
+            with zipfile.ZipFile(out_path) as zf:
+                if "collection.anki2" in zf.namelist():
+                    zf.extract("collection.anki2", tmp)
+                    reuse = True
+
+        conn = sqlite3.connect(db_path)
+        try:
+            if not reuse:
+                with conn:
+                    create_collection(conn, spec, deck_id, model_id, now)
+            inserted, updated, deleted, unchanged = write_notes(conn, spec, notes, deck_id, model_id, now)
+        finally:
+            conn.close()
+
+        if reuse and not (inserted or updated or deleted):
+            return ExportReport(out_path, len(notes), 0, 0, 0, unchanged)
+
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_apkg = os.path.join(tmp, "out.apkg")
+        with zipfile.ZipFile(tmp_apkg, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.write(db_path, "collection.anki2")
+            zf.writestr("media", "{}")
+        os.replace(tmp_apkg, out_path)
+
+    return ExportReport(out_path, len(notes), inserted, updated, deleted, unchanged)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export resource decks as Anki .apkg files")
+    parser.add_argument("--deck", action="append", choices=sorted(DECKS.keys()),
+                        help="Deck to export (repeatable). Defaults to all decks.")
+    parser.add_argument("--out-dir", default="build/anki")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update an existing .apkg in place, rewriting only changed notes.")
+    parser.add_argument("--kobun-shards", nargs="?", const=SHARD_DIR,
+                        help="Read kobun from the shard manifest written by update_kobun_json.py --output shards|both.")
+    parser.add_argument("--kobun-row", action="append",
+                        help="With --kobun-shards, load only this shard (name or label, e.g. ka / か行). Repeatable.")
+    args = parser.parse_args()
+
+    repo_root = pathlib.Path(__file__).resolve().parent.parent
+    out_dir = pathlib.Path(args.out_dir)
+    if not out_dir.is_absolute():
+        out_dir = repo_root / out_dir
+
+    if args.kobun_row and not args.kobun_shards:
+        raise SystemExit("--kobun-row requires --kobun-shards")
+
+    for name in args.deck or list(DECKS.keys()):
+        spec = DECKS[name]
+        out_name = None
+        if name == "kobun" and args.kobun_shards:
+            shard_dir = pathlib.Path(args.kobun_shards)
+            if not shard_dir.is_absolute():
+                shard_dir = repo_root / shard_dir
+            spec = kobun_shard_spec(str(shard_dir), args.kobun_row)
+            # A row subset gets its own file so --incremental never drops the other rows
+            if args.kobun_row:
+                out_name = "kobun_" + "_".join(args.kobun_row)
+        r = export_deck(spec, str(out_dir), args.incremental, out_name)
+        print(
+            f"{name}: {r.total} notes -> {r.path} "
+            f"(inserted={r.inserted}, updated={r.updated}, deleted={r.deleted}, unchanged={r.unchanged})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
+import argparse
 import csv
+import glob
+import hashlib
 import json
 import os
 import re
@@ -8,6 +11,28 @@ FILE1 = "Sources/ANKI-HUB-iOS/Resources/OriginalData/古文単語リスト - Tab
 FILE2 = "Sources/ANKI-HUB-iOS/Resources/OriginalData/重要古語・プラスアルファ古文単語一覧 - Table 1.csv"
 OUTPUT_JSON = "Sources/ANKI-HUB-iOS/Resources/kobun.json"
 PDF_JSON = "Sources/ANKI-HUB-iOS/Resources/kobun_pdf.json"
+# Kept outside Resources so shards are not bundled into the app until the
+# Swift loader reads the manifest.
+SHARD_DIR = "build/kobun_shards"
+MANIFEST_NAME = "manifest.json"
+
+# Leading-kana buckets for --shard-by row. Dakuten/handakuten and small kana
+# fall into the row of their base kana; katakana is folded to hiragana first.
+# Words with no kana reading (kanji headword without a reading in its hint)
+# go to the その他 catch-all shard.
+KANA_ROWS = [
+    ("a", "あ行", "あいうえおぁぃぅぇぉゔ"),
+    ("ka", "か行", "かきくけこがぎぐげご"),
+    ("sa", "さ行", "さしすせそざじずぜぞ"),
+    ("ta", "た行", "たちつてとだぢづでどっ"),
+    ("na", "な行", "なにぬねの"),
+    ("ha", "は行", "はひふへほばびぶべぼぱぴぷぺぽ"),
+    ("ma", "ま行", "まみむめも"),
+    ("ya", "や行", "やゆよゃゅょ"),
+    ("ra", "ら行", "らりるれろ"),
+    ("wa", "わ行", "わゐゑをんゎ"),
+]
+OTHER_ROW = ("other", "その他")
 
 def normalize_word(raw):
     if raw is None:
@@ -43,7 +68,194 @@ def is_hiragana_only(text):
         return False
     return bool(re.fullmatch(r'[ぁ-んー]+', text))
 
+def to_hiragana(text):
+    return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in text)
+
+def find_row(key):
+    if not key:
+        return None
+    for row in KANA_ROWS:
+        if key[0] in row[2]:
+            return row[:2]
+    return None
+
+def shard_key(item):
+    """Kana sort key used for bucketing and manifest ranges."""
+    # Skip leading wave dashes so "〜け" is bucketed under か行
+    key = to_hiragana(normalize_word(item.get("word")).lstrip("〜～"))
+    if find_row(key):
+        return key
+    # Kanji headword: fall back to a reading in the hint, e.g. "（おおす/下二）"
+    hint = (item.get("hint") or "").replace("（", "").replace("）", "")
+    reading = normalize_word(re.split(r"[/／]", hint)[0]).lstrip("〜～")
+    if is_hiragana_only(reading):
+        return reading
+    return key
+
+def kana_row(item):
+    return find_row(shard_key(item)) or OTHER_ROW[:2]
+
+def dump_json_bytes(data):
+    # Same formatting as the monolithic kobun.json so shards diff cleanly
+    return (json.dumps(data, ensure_ascii=False, indent=2)).encode("utf-8")
+
+def build_shards(data, shard_by, shard_size):
+    """Split items into [(name, label, items)] in manifest order."""
+    # Order by the same key the manifest ranges use, so ranges follow file order
+    data = sorted(data, key=lambda it: (shard_key(it), normalize_word(it.get("word"))))
+    if shard_by == "count":
+        if shard_size < 1:
+            raise SystemExit("--shard-size must be >= 1")
+        shards = []
+        start = 0
+        while start < len(data):
+            end = min(start + shard_size, len(data))
+            # Never split one key across two shards
+            while end < len(data) and shard_key(data[end]) == shard_key(data[end - 1]):
+                end += 1
+            name = f"{len(shards) + 1:04d}"
+            shards.append((name, f"{start + 1}-{end}", data[start:end]))
+            start = end
+        return shards
+
+    buckets = {}
+    for it in data:
+        name, label = kana_row(it)
+        buckets.setdefault((name, label), []).append(it)
+    order = [r[:2] for r in KANA_ROWS] + [OTHER_ROW[:2]]
+    return [(name, label, buckets[(name, label)]) for name, label in order if (name, label) in buckets]
+
+def write_shards(data, shard_dir, shard_by, shard_size):
+    """Write shard files plus manifest; only shards whose content changed are rewritten."""
+    os.makedirs(shard_dir, exist_ok=True)
+    manifest_path = os.path.join(shard_dir, MANIFEST_NAME)
+
+    old_hashes = {}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, mode="r", encoding="utf-8") as f:
+                old_manifest = json.load(f)
+            old_hashes = {s["file"]: s.get("sha256") for s in old_manifest.get("shards", [])}
+        except Exception as e:
+            print(f"Warning: ignoring unreadable manifest: {e}")
+
+    entries = []
+    written = 0
+    for name, label, items in build_shards(data, shard_by, shard_size):
+        payload = dump_json_bytes(items)
+        digest = hashlib.sha256(payload).hexdigest()
+        file_name = f"kobun_{name}.json"
+        path = os.path.join(shard_dir, file_name)
+        if old_hashes.get(file_name) != digest or not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(payload)
+            written += 1
+        entries.append({
+            "name": name,
+            "label": label,
+            "file": file_name,
+            "count": len(items),
+            "first": shard_key(items[0]),
+            "last": shard_key(items[-1]),
+            # Ids stay stable across rebuilds, so they are not contiguous per shard
+            "ids": sorted(it["id"] for it in items),
+            "sha256": digest,
+        })
+
+    if shard_by == "count":
+        for prev, cur in zip(entries, entries[1:]):
+            if prev["last"] >= cur["first"]:
+                raise ValueError(f"Overlapping shard ranges: {prev['name']} and {cur['name']}")
+
+    current = {e["file"] for e in entries}
+    removed = 0
+    # Only names this script generates, so e.g. kobun_pdf.json is never touched
+    row_names = "|".join(r[0] for r in KANA_ROWS + [OTHER_ROW])
+    shard_file = re.compile(rf"kobun_(\d{{4}}|{row_names})\.json")
+    for stale in glob.glob(os.path.join(shard_dir, "kobun_*.json")):
+        file_name = os.path.basename(stale)
+        if shard_file.fullmatch(file_name) and file_name not in current:
+            os.remove(stale)
+            removed += 1
+
+    manifest = {
+        "version": 1,
+        "shardBy": shard_by,
+        "shardSize": shard_size if shard_by == "count" else None,
+        "total": len(data),
+        "shards": entries,
+    }
+    payload = dump_json_bytes(manifest)
+    old_payload = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "rb") as f:
+            old_payload = f.read()
+    if payload != old_payload:
+        with open(manifest_path, "wb") as f:
+            f.write(payload)
+
+    print(f"Shards: {len(entries)} total, {written} rewritten, {removed} removed -> {shard_dir}")
+
+def previous_ids(shard_dir):
+    """Map normalized word -> id from the shards of the previous build."""
+    if not os.path.exists(os.path.join(shard_dir, MANIFEST_NAME)):
+        return {}
+    try:
+        items = load_shards(shard_dir)
+    except (OSError, ValueError, KeyError, SystemExit) as e:
+        print(f"Warning: ignoring previous shard ids: {e}")
+        return {}
+    return {normalize_word(it.get("word")): it["id"] for it in items if isinstance(it.get("id"), int)}
+
+def assign_ids(data, old_ids):
+    """Keep ids of words seen in the previous build; new words get ids after the current max."""
+    next_id = max(old_ids.values(), default=0) + 1
+    used = set()
+    for it in data:
+        old = old_ids.get(normalize_word(it.get("word")))
+        if old is not None and old not in used:
+            it["id"] = old
+            used.add(old)
+        else:
+            it["id"] = None
+    for it in data:
+        if it["id"] is None:
+            it["id"] = next_id
+            next_id += 1
+
+def load_shards(shard_dir=SHARD_DIR, names=None):
+    """Load items from the named shards only (all shards when names is None)."""
+    manifest_path = os.path.join(shard_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise SystemExit(f"Not found: {manifest_path}")
+    with open(manifest_path, mode="r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    wanted = set(names) if names is not None else None
+    if wanted is not None:
+        valid = {s["name"] for s in manifest.get("shards", [])} | {s["label"] for s in manifest.get("shards", [])}
+        unknown = sorted(wanted - valid)
+        if unknown:
+            rows = ", ".join(f"{s['name']} ({s['label']})" for s in manifest.get("shards", []))
+            raise SystemExit(f"Unknown shard(s): {', '.join(unknown)}. Valid: {rows}")
+    items = []
+    for s in manifest.get("shards", []):
+        if wanted is not None and s["name"] not in wanted and s["label"] not in wanted:
+            continue
+        with open(os.path.join(shard_dir, s["file"]), mode="r", encoding="utf-8") as f:
+            items.extend(json.load(f))
+    return items
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", choices=["json", "shards", "both"], default="json",
+                        help="json: monolithic kobun.json, shards: sharded files + manifest (app still reads kobun.json). "
+                             "With shards, ids of existing words are kept so row mode rewrites only changed rows; "
+                             "count mode also rewrites shards after an insertion point")
+    parser.add_argument("--shard-by", choices=["row", "count"], default="row")
+    parser.add_argument("--shard-size", type=int, default=200)
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    args = parser.parse_args()
+
     # 1. Load File 1
     items_file1 = {}
     
@@ -301,14 +513,25 @@ def main():
 
     # Reassign IDs sequentially for stability
     data.sort(key=lambda x: normalize_key(x.get("word")))
-    for idx, it in enumerate(data, start=1):
-        it["id"] = idx
+    if args.output in ("shards", "both"):
+        # Keep ids from the previous shards so one new word doesn't touch every shard
+        assign_ids(data, previous_ids(args.shard_dir))
+    else:
+        for idx, it in enumerate(data, start=1):
+            it["id"] = idx
 
     # Write JSON
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as jsonfile:
-        json.dump(data, jsonfile, ensure_ascii=False, indent=2)
-    
-    print(f"Successfully converted {len(data)} items (Merged) to {OUTPUT_JSON}")
+    if args.output in ("json", "both"):
+        with open(OUTPUT_JSON, 'w', encoding='utf-8') as jsonfile:
+            json.dump(data, jsonfile, ensure_ascii=False, indent=2)
+
+        print(f"Successfully converted {len(data)} items (Merged) to {OUTPUT_JSON}")
+
+    # Write Shards
+    if args.output == "shards":
+        print(f"Warning: {OUTPUT_JSON} was not updated; the app still reads it, use --output both to keep it in sync")
+    if args.output in ("shards", "both"):
+        write_shards(data, args.shard_dir, args.shard_by, args.shard_size)
 
 if __name__ == "__main__":
     main()